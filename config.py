@@ -30,6 +30,8 @@ class Config:
     
     # Настройки базы данных
     DB_SCHEMA_VERSION: int = 1
+    DB_OPTIMIZE_INTERVAL: int = 15  # минуты
+    DB_READ_POOL_SIZE: int = 4
     
     # Настройки логирования
     LOG_LEVEL: str = "INFO"
@@ -39,6 +41,14 @@ class Config:
     PARSE_MODE: str = "Markdown"
     POLLING_TIMEOUT: int = 20
     POLLING_INTERVAL: int = 0
+    NUM_THREADS: int = 8  # потоки обработчиков сообщений
+    
+    # Настройки webhook (если WEBHOOK_URL пуст, используется polling)
+    WEBHOOK_URL: str = ""
+    WEBHOOK_PATH: str = "/webhook"
+    WEBHOOK_HOST: str = "0.0.0.0"
+    WEBHOOK_PORT: int = 8443
+    WEBHOOK_SECRET: str = ""
     
     @classmethod
     def setup_dirs(cls):
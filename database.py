@@ -5,66 +5,172 @@
 """
 
 import sqlite3
-import json
+import orjson
+import queue
 import logging
+import threading
+from contextlib import contextmanager
 from datetime import datetime
+from pathlib import Path
 from typing import Dict, List, Optional
 from telebot import types
 
 logger = logging.getLogger(__name__)
 
+# Настройки соединения (действуют в пределах одного соединения)
+CONNECTION_PRAGMAS = """
+    PRAGMA synchronous=NORMAL;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA mmap_size=268435456;
+    PRAGMA busy_timeout=5000;
+"""
+
+# Схема БД
+SCHEMA_SQL = """
+    -- Пользователи
+    CREATE TABLE IF NOT EXISTS users (
+        user_id INTEGER PRIMARY KEY,
+        username TEXT,
+        first_name TEXT,
+        last_name TEXT,
+        language_code TEXT,
+        is_bot BOOLEAN,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_activity TIMESTAMP,
+        cards_drawn INTEGER DEFAULT 0,
+        readings_count INTEGER DEFAULT 0
+    );
+    
+    -- Расклады
+    CREATE TABLE IF NOT EXISTS readings (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        spread_type TEXT,
+        cards TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(user_id)
+    );
+    
+    -- История раскладов пользователя (get_user_readings)
+    CREATE INDEX IF NOT EXISTS idx_readings_user_created
+    ON readings (user_id, created_at DESC);
+"""
+
+# Размер кэша подготовленных выражений на соединение
+STATEMENT_CACHE_SIZE = 128
+
 class Database:
     """Класс для работы с SQLite базой данных"""
     
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, read_pool_size: int = 4):
         self.db_path = db_path
+        self.setup_journal()
+        
+        self._closed = False
+        
+        # Единственное соединение для записи, живет все время работы бота
+        self._lock = threading.Lock()
+        self._conn = self.get_connection()
         self.init_db()
+        
+        # Пул соединений только для чтения
+        self._pool_lock = threading.Lock()
+        self._readers = queue.Queue()
+        for _ in range(read_pool_size):
+            self._readers.put(self.get_connection(read_only=True))
     
-    def get_connection(self):
-        """Получение соединения с БД"""
+    def setup_journal(self):
+        """Включение WAL (режим журнала сохраняется в файле БД)"""
         conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+        finally:
+            conn.close()
+    
+    def get_connection(self, read_only: bool = False):
+        """Открытие нового соединения с БД"""
+        if read_only:
+            uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+            conn = sqlite3.connect(uri, uri=True,
+                                   check_same_thread=False, isolation_level=None,
+                                   cached_statements=STATEMENT_CACHE_SIZE)
+        else:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None,
+                                   cached_statements=STATEMENT_CACHE_SIZE)
+        conn.executescript(CONNECTION_PRAGMAS)
         return conn
     
+    @contextmanager
+    def writer(self):
+        """Соединение для записи (одно на весь процесс)"""
+        with self._lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError("База данных закрыта")
+            yield self._conn
+    
+    @contextmanager
+    def reader(self):
+        """Соединение для чтения из пула"""
+        conn = self._readers.get()
+        if conn is None:
+            # Метка закрытия: возвращаем ее для следующих ожидающих потоков
+            self._readers.put(None)
+            raise sqlite3.ProgrammingError("База данных закрыта")
+        try:
+            yield conn
+        finally:
+            with self._pool_lock:
+                if self._closed:
+                    conn.close()
+                else:
+                    self._readers.put(conn)
+    
+    @contextmanager
+    def transaction(self):
+        """Явная транзакция на соединении для записи"""
+        with self.writer() as conn:
+            # IMMEDIATE сразу берет блокировку записи, без повышения
+            # блокировки посреди транзакции (и SQLITE_BUSY на нем)
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+                conn.execute('COMMIT')
+            finally:
+                # Любая ошибка (включая KeyboardInterrupt и сбой COMMIT) не
+                # должна оставить общее соединение внутри открытой транзакции
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+    
+    def close(self):
+        """Закрытие всех соединений"""
+        # Дожидаемся текущей записи; новые запросы после этого отклоняются
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._conn.close()
+        
+        # Свободные читатели закрываются сразу, занятые — при возврате в пул
+        with self._pool_lock:
+            while not self._readers.empty():
+                self._readers.get_nowait().close()
+            self._readers.put(None)
+    
+    def optimize(self):
+        """Периодическая оптимизация БД"""
+        with self.writer() as conn:
+            conn.execute('PRAGMA optimize')
+        logger.debug("PRAGMA optimize выполнен")
+    
     def init_db(self):
         """Инициализация базы данных"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            
-            # Пользователи
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    user_id INTEGER PRIMARY KEY,
-                    username TEXT,
-                    first_name TEXT,
-                    last_name TEXT,
-                    language_code TEXT,
-                    is_bot BOOLEAN,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_activity TIMESTAMP,
-                    cards_drawn INTEGER DEFAULT 0,
-                    readings_count INTEGER DEFAULT 0
-                )
-            ''')
-            
-            # Расклады
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS readings (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    spread_type TEXT,
-                    cards TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users(user_id)
-                )
-            ''')
-            
-            conn.commit()
+        with self.writer() as conn:
+            conn.executescript(SCHEMA_SQL)
             logger.info("База данных инициализирована")
     
     def add_user(self, user: types.User):
         """Добавление пользователя"""
-        with self.get_connection() as conn:
+        with self.writer() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 INSERT OR IGNORE INTO users 
@@ -79,81 +185,100 @@ class Database:
                 user.is_bot,
                 datetime.now()
             ))
-            conn.commit()
     
-    def update_user_activity(self, user_id: int):
+    def update_user_activity(self, user_id: int, conn: Optional[sqlite3.Connection] = None):
         """Обновление активности пользователя"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                UPDATE users 
-                SET last_activity = ?, 
-                    cards_drawn = cards_drawn + 1,
-                    readings_count = readings_count + 1
-                WHERE user_id = ?
-            ''', (datetime.now(), user_id))
-            conn.commit()
-    
-    def save_reading(self, user_id: int, spread_type: str, cards: List[Dict]):
+        if conn is None:
+            with self.writer() as conn:
+                return self.update_user_activity(user_id, conn)
+        
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE users 
+            SET last_activity = ?, 
+                cards_drawn = cards_drawn + 1,
+                readings_count = readings_count + 1
+            WHERE user_id = ?
+        ''', (datetime.now(), user_id))
+    
+    def save_reading(self, user_id: int, spread_type: str, cards: List[Dict],
+                     conn: Optional[sqlite3.Connection] = None):
         """Сохранение расклада"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO readings (user_id, spread_type, cards)
-                VALUES (?, ?, ?)
-            ''', (
-                user_id,
-                spread_type,
-                json.dumps(cards, ensure_ascii=False)
-            ))
-            conn.commit()
-            return cursor.lastrowid
+        if conn is None:
+            with self.writer() as conn:
+                return self.save_reading(user_id, spread_type, cards, conn)
+        
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO readings (user_id, spread_type, cards)
+            VALUES (?, ?, ?)
+        ''', (
+            user_id,
+            spread_type,
+            # Колонка cards объявлена TEXT: храним строку, а не BLOB из orjson
+            orjson.dumps(cards).decode()
+        ))
+        return cursor.lastrowid
+    
+    def record_reading(self, user_id: int, spread_type: str, cards: List[Dict]):
+        """Сохранение расклада и обновление активности одной транзакцией"""
+        with self.transaction() as conn:
+            reading_id = self.save_reading(user_id, spread_type, cards, conn)
+            self.update_user_activity(user_id, conn)
+        return reading_id
     
     def get_user_stats(self, user_id: int) -> Optional[Dict]:
         """Получение статистики пользователя"""
-        with self.get_connection() as conn:
+        with self.reader() as conn:
             cursor = conn.cursor()
             cursor.execute('''
-                SELECT * FROM users WHERE user_id = ?
+                SELECT cards_drawn, readings_count, created_at
+                FROM users WHERE user_id = ?
             ''', (user_id,))
             
             row = cursor.fetchone()
             if row:
-                return dict(row)
+                return {
+                    'cards_drawn': row[0],
+                    'readings_count': row[1],
+                    'created_at': row[2]
+                }
             return None
     
     def get_user_readings(self, user_id: int, limit: int = 10) -> List[Dict]:
         """Получение раскладов пользователя"""
-        with self.get_connection() as conn:
+        with self.reader() as conn:
             cursor = conn.cursor()
             cursor.execute('''
-                SELECT * FROM readings 
+                SELECT id, user_id, spread_type, cards, created_at
+                FROM readings 
                 WHERE user_id = ? 
                 ORDER BY created_at DESC 
                 LIMIT ?
             ''', (user_id, limit))
             
-            readings = []
-            for row in cursor.fetchall():
-                reading = dict(row)
-                reading['cards'] = json.loads(reading['cards'])
-                readings.append(reading)
-            
-            return readings
+            return [
+                {
+                    'id': row[0],
+                    'user_id': row[1],
+                    'spread_type': row[2],
+                    'cards': orjson.loads(row[3]),
+                    'created_at': row[4]
+                }
+                for row in cursor.fetchall()
+            ]
     
     def get_total_stats(self) -> Dict:
         """Получение общей статистики"""
-        with self.get_connection() as conn:
+        with self.reader() as conn:
             cursor = conn.cursor()
-            
-            cursor.execute('SELECT COUNT(*) FROM users')
-            total_users = cursor.fetchone()[0]
-            
-            cursor.execute('SELECT SUM(cards_drawn) FROM users')
-            total_cards = cursor.fetchone()[0] or 0
-            
-            cursor.execute('SELECT COUNT(*) FROM readings')
-            total_readings = cursor.fetchone()[0]
+            cursor.execute('''
+                SELECT
+                    (SELECT COUNT(*) FROM users),
+                    (SELECT COALESCE(SUM(cards_drawn), 0) FROM users),
+                    (SELECT COUNT(*) FROM readings)
+            ''')
+            total_users, total_cards, total_readings = cursor.fetchone()
             
             return {
                 'total_users': total_users,
@@ -9,7 +9,9 @@ import sys
 import json
 import logging
 import argparse
+from functools import lru_cache
 from pathlib import Path
+from string import Template
 
 # Добавляем текущую директорию в путь для импортов
 sys.path.append(str(Path(__file__).parent))
@@ -19,7 +21,10 @@ from database import Database
 from tarot_deck import TarotDeck, TarotCard, CardType
 from tarot_spreads import TarotSpreads
 
+import asyncio
+import schedule
 import telebot
+from aiohttp import web
 from telebot import types
 from telebot.types import BotCommand, BotCommandScopeChat
 
@@ -34,16 +39,90 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Статические тексты ответов
+_WELCOME_PRIVATE_TMPL = (
+    "✨ *Добро пожаловать, %s!* ✨\n\n"
+    "Я — *бот для гадания на Таро* 🎴\n\n"
+    "*⚡ Быстрые команды:*\n"
+    "• `/card` - Быстрая карта\n"
+    "• `/day` - Карта дня\n"
+    "• `/three` - 3 карты\n"
+    "• `/love` - Любовь\n"
+    "• `/work` - Работа\n"
+    "• `/money` - Финансы\n"
+    "• `/health` - Здоровье\n"
+    "• `/quick` - Все команды\n\n"
+    "🎴 *Выберите команду из меню!*"
+)
+
+_WELCOME_GROUP = (
+    "✨ *Таро-бот в вашей группе!* ✨\n\n"
+    "Используйте команды:\n"
+    "• `/card` - Быстрая карта\n"
+    "• `/day` - Карта дня\n"
+    "• `/three` - 3 карты\n\n"
+    "💡 *Пример:* `/card`"
+)
+
+_ALL_COMMANDS = "\n".join([
+    "🎴 *Доступные команды:*\n\n",
+    "• /card - Быстрая карта",
+    "• /day - Карта дня",
+    "• /three - 3 карты (Прошлое-Настоящее-Будущее)",
+    "• /love - Расклад на любовь",
+    "• /work - Расклад на работу",
+    "• /money - Финансовый расклад",
+    "• /health - Расклад на здоровье",
+    "• /yesno - Да/Нет расклад",
+    "• /advice - Карта совета",
+    "• /future - Расклад на будущее\n\n",
+    "📊 /stats - Ваша статистика",
+    "⚡ /quick - Повторно показать команды",
+    "❓ /help - Помощь"
+])
+
+@lru_cache(maxsize=256)
+def _format_welcome(user_name: str, chat_type: str) -> str:
+    """Приветственный текст (кэшируется для повторных /start)"""
+    if chat_type == 'private':
+        return _WELCOME_PRIVATE_TMPL % user_name
+    return _WELCOME_GROUP
+
 class TarotBot:
     """Основной класс бота"""
     
     def __init__(self, token: str):
         self.token = token
-        self.bot = telebot.TeleBot(token, parse_mode=Config.PARSE_MODE)
-        self.db = Database(str(Config.DB_FILE))
+        # Обработчики выполняются в пуле потоков, поэтому отправка сообщений
+        # и запись в БД по разным обновлениям идут параллельно с polling
+        self.bot = telebot.TeleBot(
+            token,
+            parse_mode=Config.PARSE_MODE,
+            threaded=True,
+            num_threads=Config.NUM_THREADS
+        )
+        self.db = Database(str(Config.DB_FILE), Config.DB_READ_POOL_SIZE)
         self.deck = TarotDeck()
         self.spreads = TarotSpreads()
         self.is_running = False
+        self._webhook_loop = None
+        # Позиции раскладов, дополненные до числа карт
+        self._positions: dict[tuple, tuple] = {}
+        
+        # Шаблоны ответов для раскладов
+        self._templates = {
+            'daily': Template(
+                "✨ *${name} для ${user_name}* ✨\n\n"
+                "${card}"
+                "\n\n🌅 *Совет на день:* Прислушайтесь к интуиции!"
+            ),
+            'default': Template(
+                "✨ *${name} для ${user_name}* ✨\n\n"
+                "*${description}*\n\n"
+                "${cards}"
+            ),
+        }
+        self._card_template = Template("*${index}. ${position}:*\n${card}\n\n")
         
         # Загрузка конфигурации
         self.load_config()
@@ -52,7 +131,7 @@ class TarotBot:
         self.setup_handlers()
         self.setup_menu_commands()
         
-        logger.info(f"Бот инициализирован")
+        logger.info("Бот инициализирован")
     
     def load_config(self):
         """Загрузка конфигурации"""
@@ -62,8 +141,10 @@ class TarotBot:
                     config_data = json.load(f)
                     Config.TOKEN = config_data.get('token', '')
                     Config.ADMIN_ID = config_data.get('admin_id', 0)
+                    Config.WEBHOOK_URL = config_data.get('webhook_url', '')
+                    Config.WEBHOOK_SECRET = config_data.get('webhook_secret', '')
         except Exception as e:
-            logger.error(f"Ошибка загрузки конфигурации: {e}")
+            logger.error("Ошибка загрузки конфигурации: %s", e)
     
     def setup_menu_commands(self):
         """Настройка команд меню бота"""
@@ -94,7 +175,7 @@ class TarotBot:
             
             logger.info("Команды меню настроены")
         except Exception as e:
-            logger.error(f"Ошибка настройки команд: {e}")
+            logger.error("Ошибка настройки команд: %s", e)
     
     def setup_handlers(self):
         """Настройка обработчиков команд"""
@@ -108,7 +189,7 @@ class TarotBot:
             welcome_text = self.get_welcome_text(user.first_name, message.chat.type)
             self.bot.send_message(message.chat.id, welcome_text)
             
-            logger.info(f"Пользователь {user.id} начал работу")
+            logger.info("Пользователь %s начал работу", user.id)
         
         @self.bot.message_handler(commands=['card'])
         def handle_card(message):
@@ -183,89 +264,69 @@ class TarotBot:
         response = self.format_spread_response(spread_info, cards_data, user.first_name)
         
         # Сохраняем в базу
-        self.db.save_reading(user.id, spread_type, cards_data)
-        self.db.update_user_activity(user.id)
+        cards = [card.to_dict(is_reversed) for card, is_reversed in cards_data]
+        self.db.record_reading(user.id, spread_type, cards)
         
         # Отправляем ответ
         self.bot.send_message(message.chat.id, response, parse_mode="Markdown")
         
-        logger.info(f"Расклад {spread_type} для пользователя {user.id}")
+        logger.info("Расклад %s для пользователя %s", spread_type, user.id)
     
     def format_spread_response(self, spread_info: dict, cards_data: list, user_name: str) -> str:
         """Форматирование ответа для расклада"""
-        response = f"✨ *{spread_info['name']} для {user_name}* ✨\n\n"
+        layout = spread_info['type']
+        template = self._templates.get(layout, self._templates['default'])
         
-        if spread_info['type'] == 'daily':
+        if layout == 'daily':
             card, is_reversed = cards_data[0]
-            response += card.get_description(is_reversed)
-            response += "\n\n🌅 *Совет на день:* Прислушайтесь к интуиции!"
-        
-        elif spread_info['type'] == 'three_cards':
-            positions = spread_info.get('positions', ['Прошлое', 'Настоящее', 'Будущее'])
-            response += f"*{spread_info['description']}*\n\n"
-            
-            for i, ((card, is_reversed), position) in enumerate(zip(cards_data, positions), 1):
-                response += f"*{i}. {position}:*\n"
-                response += f"{card.get_description(is_reversed)}\n\n"
+            return template.substitute(
+                name=spread_info['name'],
+                user_name=user_name,
+                card=card.get_description(is_reversed)
+            )
         
-        else:
-            positions = spread_info.get('positions', [])
-            response += f"*{spread_info['description']}*\n\n"
+        # В раскладе из трех карт — полные описания, в остальных — краткие
+        full = layout == 'three_cards'
+        positions = self.get_spread_positions(spread_info)
+        cards = "".join(
+            self._card_template.substitute(
+                index=i,
+                position=position,
+                card=card.get_description(is_reversed) if full else card.get_short_description(is_reversed)
+            )
+            for i, ((card, is_reversed), position) in enumerate(zip(cards_data, positions), 1)
+        )
+        
+        return template.substitute(
+            name=spread_info['name'],
+            user_name=user_name,
+            description=spread_info['description'],
+            cards=cards
+        )
+    
+    def get_spread_positions(self, spread_info: dict) -> tuple:
+        """Названия позиций расклада, дополненные до числа карт"""
+        # Ключ строится по содержимому: результат зависит только от этих полей
+        key = (spread_info['type'], spread_info['cards'], tuple(spread_info.get('positions', ())))
+        positions = self._positions.get(key)
+        if positions is None:
+            if spread_info['type'] == 'three_cards':
+                names = spread_info.get('positions', ['Прошлое', 'Настоящее', 'Будущее'])
+            else:
+                names = spread_info.get('positions', [])
             
-            for i, (card, is_reversed) in enumerate(cards_data, 1):
-                position = positions[i-1] if i <= len(positions) else f"Карта {i}"
-                response += f"*{i}. {position}:*\n"
-                response += f"{card.get_short_description(is_reversed)}\n\n"
-        
-        return response
+            count = max(spread_info['cards'], len(names))
+            positions = tuple(names) + tuple(f"Карта {i}" for i in range(len(names) + 1, count + 1))
+            self._positions[key] = positions
+        return positions
     
     def get_welcome_text(self, user_name: str, chat_type: str) -> str:
         """Получить приветственный текст"""
-        if chat_type == 'private':
-            return (
-                f"✨ *Добро пожаловать, {user_name}!* ✨\n\n"
-                f"Я — *бот для гадания на Таро* 🎴\n\n"
-                f"*⚡ Быстрые команды:*\n"
-                f"• `/card` - Быстрая карта\n"
-                f"• `/day` - Карта дня\n"
-                f"• `/three` - 3 карты\n"
-                f"• `/love` - Любовь\n"
-                f"• `/work` - Работа\n"
-                f"• `/money` - Финансы\n"
-                f"• `/health` - Здоровье\n"
-                f"• `/quick` - Все команды\n\n"
-                f"🎴 *Выберите команду из меню!*"
-            )
-        else:
-            return (
-                f"✨ *Таро-бот в вашей группе!* ✨\n\n"
-                f"Используйте команды:\n"
-                f"• `/card` - Быстрая карта\n"
-                f"• `/day` - Карта дня\n"
-                f"• `/three` - 3 карты\n\n"
-                f"💡 *Пример:* `/card`"
-            )
+        return _format_welcome(user_name, chat_type)
     
     def get_all_commands(self) -> str:
         """Получить список всех команд"""
-        commands = [
-            "🎴 *Доступные команды:*\n\n",
-            "• /card - Быстрая карта",
-            "• /day - Карта дня",
-            "• /three - 3 карты (Прошлое-Настоящее-Будущее)",
-            "• /love - Расклад на любовь",
-            "• /work - Расклад на работу",
-            "• /money - Финансовый расклад",
-            "• /health - Расклад на здоровье",
-            "• /yesno - Да/Нет расклад",
-            "• /advice - Карта совета",
-            "• /future - Расклад на будущее\n\n",
-            "📊 /stats - Ваша статистика",
-            "⚡ /quick - Повторно показать команды",
-            "❓ /help - Помощь"
-        ]
-        
-        return "\n".join(commands)
+        return _ALL_COMMANDS
     
     def start(self):
         """Запуск бота"""
@@ -278,17 +339,32 @@ class TarotBot:
         try:
             # Проверка токена
             bot_info = self.bot.get_me()
-            logger.info(f"Бот @{bot_info.username} успешно запущен")
+            logger.info("Бот @%s успешно запущен", bot_info.username)
             
-            # Запуск polling
             import threading
-            polling_thread = threading.Thread(target=self._run_polling, daemon=True)
-            polling_thread.start()
+            if Config.WEBHOOK_URL:
+                # Запуск webhook: обновления приходят сразу, без long-poll
+                self.bot.remove_webhook()
+                self.bot.set_webhook(
+                    url=Config.WEBHOOK_URL.rstrip('/') + Config.WEBHOOK_PATH,
+                    secret_token=Config.WEBHOOK_SECRET or None
+                )
+                receiver_thread = threading.Thread(target=self._run_webhook, daemon=True)
+            else:
+                # Запуск polling. Оставшийся webhook (например, после аварийного
+                # завершения) блокирует getUpdates ошибкой 409, поэтому снимаем его
+                self.bot.remove_webhook()
+                receiver_thread = threading.Thread(target=self._run_polling, daemon=True)
+            receiver_thread.start()
+            
+            # Периодическое обслуживание БД
+            maintenance_thread = threading.Thread(target=self._run_maintenance, daemon=True)
+            maintenance_thread.start()
             
             return True
             
         except Exception as e:
-            logger.error(f"Ошибка при запуске бота: {e}")
+            logger.error("Ошибка при запуске бота: %s", e)
             self.is_running = False
             return False
     
@@ -303,7 +379,7 @@ class TarotBot:
                         timeout=Config.POLLING_TIMEOUT
                     )
                 except Exception as e:
-                    logger.error(f"Ошибка в polling: {e}")
+                    logger.error("Ошибка в polling: %s", e)
                     import time
                     time.sleep(5)
         except KeyboardInterrupt:
@@ -311,6 +387,59 @@ class TarotBot:
         finally:
             self.is_running = False
     
+    def _run_webhook(self):
+        """Запуск webhook-сервера aiohttp в отдельном потоке"""
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._webhook_loop = loop
+        
+        app = web.Application()
+        app.router.add_post(Config.WEBHOOK_PATH, self._handle_webhook)
+        runner = web.AppRunner(app)
+        
+        try:
+            loop.run_until_complete(runner.setup())
+            site = web.TCPSite(runner, Config.WEBHOOK_HOST, Config.WEBHOOK_PORT)
+            loop.run_until_complete(site.start())
+            logger.info("Webhook слушает %s:%s%s", Config.WEBHOOK_HOST, Config.WEBHOOK_PORT, Config.WEBHOOK_PATH)
+            loop.run_forever()
+        except Exception as e:
+            logger.error("Ошибка webhook-сервера: %s", e)
+        finally:
+            loop.run_until_complete(runner.cleanup())
+            loop.close()
+            self._webhook_loop = None
+            self.is_running = False
+            # Не оставляем webhook зарегистрированным, если сервер не поднялся или упал
+            try:
+                self.bot.remove_webhook()
+            except Exception as e:
+                logger.error("Ошибка удаления webhook: %s", e)
+    
+    async def _handle_webhook(self, request):
+        """Обработка обновления от Telegram"""
+        if Config.WEBHOOK_SECRET and \
+                request.headers.get('X-Telegram-Bot-Api-Secret-Token') != Config.WEBHOOK_SECRET:
+            return web.Response(status=403)
+        
+        json_string = await request.text()
+        # Обработчики уходят в пул потоков бота, цикл событий не блокируется
+        self.bot.process_new_updates([types.Update.de_json(json_string)])
+        return web.Response()
+    
+    def _run_maintenance(self):
+        """Периодические задачи обслуживания в отдельном потоке"""
+        import time
+        scheduler = schedule.Scheduler()
+        scheduler.every(Config.DB_OPTIMIZE_INTERVAL).minutes.do(self.db.optimize)
+        
+        while self.is_running:
+            try:
+                scheduler.run_pending()
+            except Exception as e:
+                logger.error("Ошибка обслуживания БД: %s", e)
+            time.sleep(1)
+    
     def stop(self):
         """Остановка бота"""
         if not self.is_running:
@@ -319,10 +448,15 @@ class TarotBot:
         
         self.is_running = False
         try:
-            self.bot.stop_polling()
+            if self._webhook_loop:
+                self._webhook_loop.call_soon_threadsafe(self._webhook_loop.stop)
+                self.bot.remove_webhook()
+            else:
+                self.bot.stop_polling()
+            self.db.close()
             logger.info("Бот остановлен")
         except Exception as e:
-            logger.error(f"Ошибка при остановке бота: {e}")
+            logger.error("Ошибка при остановке бота: %s", e)
 
 def setup_config():
     """Настройка конфигурации"""
@@ -397,6 +531,8 @@ def main():
         
         Config.TOKEN = config_data.get('token', '')
         Config.ADMIN_ID = config_data.get('admin_id', 0)
+        Config.WEBHOOK_URL = config_data.get('webhook_url', '')
+        Config.WEBHOOK_SECRET = config_data.get('webhook_secret', '')
         
         if not Config.TOKEN:
             print("❌ Токен не найден в конфигурации")
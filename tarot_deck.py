@@ -4,14 +4,14 @@
 Классы для работы с картами Таро
 """
 
-import json
 import random
+import orjson
 from enum import Enum
-from dataclasses import dataclass, asdict
-from typing import List, Tuple, Optional, Dict
+from dataclasses import dataclass, field, asdict
+from typing import List, Tuple, Optional, Dict, Sequence
 from pathlib import Path
 
-class CardType(Enum):
+class CardType(str, Enum):
     """Типы карт Таро"""
     MAJOR = "Старшие Арканы"
     CUPS = "Кубки"
@@ -19,7 +19,7 @@ class CardType(Enum):
     WANDS = "Жезлы"
     PENTACLES = "Пентакли"
 
-@dataclass
+@dataclass(slots=True)
 class TarotCard:
     """Класс карты Таро"""
     name: str
@@ -31,9 +31,21 @@ class TarotCard:
     element: str = ""
     astro: str = ""
     
+    # Готовые описания, заполняются в __post_init__
+    _desc_upright: str = field(init=False, repr=False, compare=False)
+    _desc_reversed: str = field(init=False, repr=False, compare=False)
+    _short_upright: str = field(init=False, repr=False, compare=False)
+    _short_reversed: str = field(init=False, repr=False, compare=False)
+    
     def __post_init__(self):
         if self.keywords is None:
             self.keywords = []
+        
+        # Тексты карты неизменны, поэтому описания собираются один раз
+        self._desc_upright = self._build_description(False)
+        self._desc_reversed = self._build_description(True)
+        self._short_upright = self._build_short_description(False)
+        self._short_reversed = self._build_short_description(True)
     
     def get_meaning(self, is_reversed: bool = False) -> str:
         """Получение значения карты"""
@@ -46,26 +58,36 @@ class TarotCard:
     
     def get_description(self, is_reversed: bool = False) -> str:
         """Полное описание карты"""
+        return self._desc_reversed if is_reversed else self._desc_upright
+    
+    def get_short_description(self, is_reversed: bool = False) -> str:
+        """Краткое описание"""
+        return self._short_reversed if is_reversed else self._short_upright
+    
+    def _build_description(self, is_reversed: bool) -> str:
+        """Сборка полного описания карты"""
         position = "🔻 Перевернутая" if is_reversed else "🔺 Прямая"
         
-        description = f"🎴 *{self.name}*\n"
-        description += f"📊 *Тип:* {self.card_type.value}\n"
-        description += f"⚖️ *Положение:* {position}\n\n"
-        description += f"📖 *Значение:*\n{self.get_meaning(is_reversed)}\n\n"
+        parts = [
+            f"🎴 *{self.name}*\n",
+            f"📊 *Тип:* {self.card_type.value}\n",
+            f"⚖️ *Положение:* {position}\n\n",
+            f"📖 *Значение:*\n{self.get_meaning(is_reversed)}\n\n"
+        ]
         
         if self.keywords:
-            description += f"🏷️ *Ключевые слова:* {', '.join(self.keywords)}\n"
+            parts.append(f"🏷️ *Ключевые слова:* {', '.join(self.keywords)}\n")
         
         if self.element:
-            description += f"🌿 *Стихия:* {self.element}\n"
+            parts.append(f"🌿 *Стихия:* {self.element}\n")
         
         if self.astro:
-            description += f"⭐ *Астрология:* {self.astro}\n"
+            parts.append(f"⭐ *Астрология:* {self.astro}\n")
         
-        return description
+        return "".join(parts)
     
-    def get_short_description(self, is_reversed: bool = False) -> str:
-        """Краткое описание"""
+    def _build_short_description(self, is_reversed: bool) -> str:
+        """Сборка краткого описания"""
         return f"{self.name} ({'🔻' if is_reversed else '🔺'}) - {self.get_short_meaning(is_reversed)}"
     
     def to_dict(self, is_reversed: bool = False) -> Dict:
@@ -82,9 +104,16 @@ class TarotDeck:
     """Колода карт Таро"""
     
     def __init__(self):
-        self.cards: List[TarotCard] = []
+        self.cards: Sequence[TarotCard] = []
         self.load_deck()
     
+    def draw_cards(self, count: int = 1) -> List[Tuple[TarotCard, bool]]:
+        """Вытянуть карты: список пар (карта, перевернута ли)"""
+        picks = random.sample(self.cards, min(count, len(self.cards)))
+        # Один вызов ГСЧ на флаги положения всех карт
+        bits = random.getrandbits(len(picks)) if picks else 0
+        return [(card, bool((bits >> i) & 1)) for i, card in enumerate(picks)]
+    
     def load_deck(self):
         """Загрузка колоды"""
         # Попробуем загрузить из файла
@@ -92,12 +121,13 @@ class TarotDeck:
         
         if deck_file.exists():
             try:
-                with open(deck_file, 'r', encoding='utf-8') as f:
-                    cards_data = json.load(f)
+                cards_data = orjson.loads(deck_file.read_bytes())
+                card_types = {card_type.value: card_type for card_type in CardType}
                 
-                for card_data in cards_data:
-                    card_data['card_type'] = CardType(card_data['card_type'])
-                    self.cards.append(TarotCard(**card_data))
+                self.cards = tuple(
+                    TarotCard(**{**card_data, 'card_type': card_types[card_data['card_type']]})
+                    for card_data in cards_data
+                )
                 
                 print(f"✅ Загружено {len(self.cards)} карт из файла")
                 return
@@ -106,6 +136,8 @@ class TarotDeck:
         
         # Иначе создаем базовую колоду
         self._create_basic_deck()
+        # Колода только для чтения: draw_cards не мутирует ее и не требует блокировок
+        self.cards = tuple(self.cards)
         print(f"✅ Создана базовая колода из {len(self.cards)} карт")
     
     def _create_basic_deck(self):